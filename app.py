@@ -1,160 +1,1355 @@
-from flask import Flask, request, jsonify
-from datetime import datetime, timedelta
+from flask import (
+    Blueprint, Flask, Response, current_app, g, has_app_context, has_request_context, jsonify, request,
+    stream_with_context
+)
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+import csv
+import io
+import json
+import math
+import os
+import queue
+import re
+import struct
+import threading
+import time
+import click
 import redis
+from dotenv import load_dotenv
 from flask_cors import CORS
+from redis.backoff import ExponentialBackoff
+from redis.client import NEVER_DECODE, Pipeline
+from redis.retry import Retry
+
+timer = Blueprint("timer", __name__, cli_group=None)
+
+# Redis settings, overridable from the environment (or a .env file).
+# REDIS_URL=memory:// selects an in-process fakeredis server for tests and
+# benchmarks (pip install -r requirements-dev.txt).
+DEFAULT_CONFIG = {
+    "REDIS_URL": "redis://localhost:6379/0",
+    "REDIS_MAX_CONNECTIONS": 20,
+    "REDIS_POOL_TIMEOUT": 5.0,
+    "REDIS_SOCKET_TIMEOUT": 5.0,
+    "REDIS_CONNECT_TIMEOUT": 2.0,
+    "REDIS_RETRIES": 3,
+    "REDIS_HEALTH_CHECK_INTERVAL": 30,
+    "ARCHIVE_AFTER_DAYS": 90,
+}
+
+# Completed sessions, scored by end_time (epoch seconds), newest last
+HISTORY_INDEX = "session_history"
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 500
 
-app = Flask(__name__)
-CORS(app, resources={
-    r"/timer/*": {"origins": "*"},
-    r"/users/*": {"origins": "*"}
-})
-
-# Redis configuration
-redis_client = redis.Redis(
-    host='redis-11218.crce174.ca-central-1-1.ec2.redns.redis-cloud.com',
-    port=11218,
-    password='8RnOTKOvdVDEY2c7Ukyd4WQMQRvHJ7M6',
-    decode_responses=True
+# Every key a timer touches. The global /timer/* endpoints keep the original
+# key names; each user gets their own namespace under a {user_id} hash tag so
+# all of one user's keys land in the same Redis Cluster slot.
+TimerKeys = namedtuple(
+    "TimerKeys",
+    [
+        "active", "counter", "history", "session_prefix", "events", "rollups",
+        "archive_prefix", "archive_months"
+    ]
 )
 
-@app.route('/timer/start', methods=['POST', 'OPTIONS'])
+GLOBAL_KEYS = TimerKeys(
+    "active_sessions", "session_counter", HISTORY_INDEX, "session:", "timer_events", "session_rollups",
+    "session_archive:", "session_archive_months"
+)
+
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+def _user_keys(user_id):
+    prefix = f"user:{{{user_id}}}"
+    return TimerKeys(
+        f"{prefix}:active", f"{prefix}:counter", f"{prefix}:sessions", f"{prefix}:session:",
+        f"{prefix}:events", f"{prefix}:rollups", f"{prefix}:archive:", f"{prefix}:archive_months"
+    )
+
+# Old completed sessions are compacted out of their hashes into one string
+# per namespace and end_time month ("<archive_prefix>YYYY-MM") of fixed-width
+# records: session id, start and end as epoch microseconds, hourly and total
+# pay. archive_months scores each archived month by its start epoch. Ids are
+# capped so Lua scripts, whose numbers are doubles, handle them exactly.
+ARCHIVE_RECORD = struct.Struct("<Qqqdd")
+MAX_SESSION_ID = 2 ** 53 - 1
+ARCHIVE_MONTH_SPAN_SECONDS = 31 * 86400
+EPOCH = datetime(1970, 1, 1)
+
+# Completed sessions are rolled up per UTC day of their end_time into one
+# hash per namespace, with "<YYYY-MM-DD>:hours", ":pay" and ":sessions" fields.
+ROLLUP_FIELDS = ("hours", "pay", "sessions")
+REPORT_GRANULARITIES = ("day", "week", "month")
+REPORT_DEFAULT_DAYS = 30
+REPORT_MAX_DAYS = 3660
+
+# How long a worker may serve the active session from memory. Start/stop
+# events invalidate cached entries immediately; the TTL only bounds
+# staleness if an event is lost.
+ACTIVE_CACHE_TTL_SECONDS = 5
+ACTIVE_CACHE_MAX_ENTRIES = 10000
+
+# Sessions per pipelined batch for /timer/export and /timer/import
+TRANSFER_BATCH_SIZE = 1000
+EXPORT_FIELDS = ("session_id", "start_time", "end_time", "hourly_pay", "total_pay")
+
+# Seconds between SSE comments that keep idle streams from being closed by proxies
+STREAM_KEEPALIVE_SECONDS = 15
+
+# State transitions run server-side so each one is atomic and costs a single
+# round trip. Session keys are built inside the script from ARGV[1], the
+# session key prefix, and every transition is published on the events
+# channel passed as the last argument. A connection reset after a script was
+# sent makes redis-py send it again, so a script that finds its own earlier
+# run (recognised by the request's timestamp) returns that result instead.
+START_SESSION_SCRIPT = """
+local active = redis.call('SMEMBERS', KEYS[1])
+if #active > 0 then
+    local session_id = active[1]
+    local session = redis.call('HMGET', ARGV[1] .. session_id, 'hourly_pay', 'start_time')
+    if session[1] == ARGV[2] and session[2] == ARGV[3] then
+        return {'started', session_id, ARGV[2], ARGV[3]}
+    end
+    return {'already_running', session_id, session[1], session[2]}
+end
+
+local session_id = redis.call('INCR', KEYS[2])
+redis.call('HSET', ARGV[1] .. session_id,
+    'start_time', ARGV[3],
+    'hourly_pay', ARGV[2],
+    'active', 'true',
+    'end_time', '',
+    'total_pay', '0')
+redis.call('SADD', KEYS[1], session_id)
+redis.call('PUBLISH', ARGV[4], cjson.encode({
+    event = 'started',
+    session_id = tostring(session_id),
+    hourly_pay = tonumber(ARGV[2]),
+    start_time = ARGV[3]
+}))
+return {'started', tostring(session_id), ARGV[2], ARGV[3]}
+"""
+
+STOP_SESSION_SCRIPT = """
+-- Seconds since the epoch for a naive UTC isoformat() timestamp, or nil
+local function to_epoch(iso)
+    local y, m, d, hh, mm, ss = string.match(iso or '', '^(%d+)-(%d+)-(%d+)T(%d+):(%d+):([%d%.]+)')
+    if not y then return nil end
+    y, m, d = tonumber(y), tonumber(m), tonumber(d)
+    if m <= 2 then y = y - 1 end
+    local era = math.floor(y / 400)
+    local yoe = y - era * 400
+    local doy = math.floor((153 * ((m + 9) % 12) + 2) / 5) + d - 1
+    local doe = yoe * 365 + math.floor(yoe / 4) - math.floor(yoe / 100) + doy
+    local days = era * 146097 + doe - 719468
+    return days * 86400 + tonumber(hh) * 3600 + tonumber(mm) * 60 + tonumber(ss)
+end
+
+local function is_finite(x)
+    return x ~= nil and x == x and x ~= math.huge and x ~= -math.huge
+end
+
+local function hours_between(start_epoch, end_epoch)
+    return string.format('%.17g', (end_epoch - start_epoch) / 3600)
+end
+
+local active = redis.call('SMEMBERS', KEYS[1])
+if #active == 0 then
+    for _, session_id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], ARGV[3], ARGV[3])) do
+        local session = redis.call('HMGET', ARGV[1] .. session_id, 'end_time', 'start_time', 'total_pay')
+        if session[1] == ARGV[2] then
+            local hours = hours_between(to_epoch(session[2]), tonumber(ARGV[3]))
+            return {'stopped', session_id, session[2], hours, session[3]}
+        end
+    end
+    return {'no_active'}
+end
+
+local session_id = active[1]
+local session_key = ARGV[1] .. session_id
+local session = redis.call('HMGET', session_key, 'active', 'start_time', 'hourly_pay')
+if session[1] ~= 'true' then
+    return {'invalid', session_id}
+end
+
+-- Redis doesn't roll back a failing script, so check everything before writing
+local start_epoch = to_epoch(session[2])
+local hourly_pay = tonumber(session[3])
+if not (is_finite(start_epoch) and is_finite(hourly_pay)) then
+    return {'invalid', session_id}
+end
+local elapsed_hours = (tonumber(ARGV[3]) - start_epoch) / 3600
+if not is_finite(hourly_pay * elapsed_hours) then
+    return {'invalid', session_id}
+end
+local hours = hours_between(start_epoch, tonumber(ARGV[3]))
+local total_pay = string.format('%.2f', hourly_pay * elapsed_hours)
+
+redis.call('HSET', session_key,
+    'active', 'false',
+    'end_time', ARGV[2],
+    'total_pay', total_pay)
+redis.call('SREM', KEYS[1], session_id)
+redis.call('ZADD', KEYS[2], ARGV[3], session_id)
+redis.call('HINCRBYFLOAT', KEYS[3], ARGV[5] .. ':hours', hours)
+redis.call('HINCRBYFLOAT', KEYS[3], ARGV[5] .. ':pay', total_pay)
+redis.call('HINCRBY', KEYS[3], ARGV[5] .. ':sessions', 1)
+redis.call('PUBLISH', ARGV[4], cjson.encode({
+    event = 'stopped',
+    session_id = session_id,
+    start_time = session[2],
+    end_time = ARGV[2],
+    total_pay = tonumber(total_pay)
+}))
+return {'stopped', session_id, session[2], hours, total_pay}
+"""
+
+# Import a batch of completed sessions, given as a JSON array in ARGV[2] with
+# every value already a string. Sessions whose id is stored, or archived in
+# the month of their end_time (ARGV[3] is the archive key prefix, ARGV[4] the
+# record size), are skipped, which also drops repeated ids within the batch. Checking, raising
+# the counter past the imported ids and writing happen in one script, so a
+# concurrent start can't be handed an id between the check and the write.
+# Returns how many sessions were written; if redis-py sends it again after a
+# connection reset, the second run finds every session stored and writes none.
+IMPORT_SESSIONS_SCRIPT = """
+-- Ids archived per month, read from the leading little-endian uint64 of each record
+local archived = {}
+local function is_archived(month, session_id)
+    if archived[month] == nil then
+        archived[month] = {}
+        local blob = redis.call('GET', ARGV[3] .. month)
+        if blob then
+            for offset = 1, #blob, tonumber(ARGV[4]) do
+                local id = 0
+                for index = offset + 7, offset, -1 do
+                    id = id * 256 + string.byte(blob, index)
+                end
+                archived[month][id] = true
+            end
+        end
+    end
+    return archived[month][tonumber(session_id)] ~= nil
+end
+
+local written = 0
+local max_id = 0
+for _, session in ipairs(cjson.decode(ARGV[2])) do
+    local session_key = ARGV[1] .. session.session_id
+    if redis.call('EXISTS', session_key) == 0 and not is_archived(session.month, session.session_id) then
+        redis.call('HSET', session_key,
+            'start_time', session.start_time,
+            'hourly_pay', session.hourly_pay,
+            'active', 'false',
+            'end_time', session.end_time,
+            'total_pay', session.total_pay)
+        redis.call('ZADD', KEYS[2], session.end_epoch, session.session_id)
+        redis.call('HINCRBYFLOAT', KEYS[3], session.day .. ':hours', session.hours)
+        redis.call('HINCRBYFLOAT', KEYS[3], session.day .. ':pay', session.total_pay)
+        redis.call('HINCRBY', KEYS[3], session.day .. ':sessions', 1)
+        written = written + 1
+        max_id = math.max(max_id, tonumber(session.session_id))
+    end
+end
+
+if tonumber(redis.call('GET', KEYS[1]) or '0') < max_id then
+    redis.call('SET', KEYS[1], string.format('%d', max_id))
+end
+return written
+"""
+
+# Histogram bucket upper bounds for /metrics
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+REDIS_COMMAND_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 500, 1000, 5000)
+
+class Metrics:
+    """In-process counters and histograms rendered in Prometheus text format.
+
+    Values are per process; under gunicorn each worker reports its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def inc(self, name, help_text, labels=(), amount=1):
+        with self._lock:
+            self._help[name] = ("counter", help_text)
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, help_text, buckets, value, labels=()):
+        with self._lock:
+            self._help[name] = ("histogram", help_text)
+            key = (name, labels)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0
+                }
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def render(self, extra_counters=()):
+        """Render every metric, plus (name, help, value) counters computed elsewhere."""
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text) in sorted(self._help.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                if metric_type == "counter":
+                    for (metric, labels), value in sorted(self._counters.items()):
+                        if metric == name:
+                            lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        for name, help_text, value in extra_counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ('{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"')) for name, value in labels)
+    return "{" + ",".join(pairs) + "}"
+
+def _record_redis_call(commands, seconds):
+    """Attribute a Redis round trip to the process totals and the current request."""
+    if not has_app_context():
+        return
+    metrics = _state().metrics
+    metrics.inc("timer_redis_commands_total", "Redis commands sent.", amount=commands)
+    metrics.inc("timer_redis_round_trips_total", "Redis round trips (a pipeline counts once).")
+    metrics.inc("timer_redis_seconds_total", "Time spent waiting on Redis.", amount=seconds)
+    if has_request_context():
+        g.redis_commands = g.get("redis_commands", 0) + commands
+        g.redis_seconds = g.get("redis_seconds", 0.0) + seconds
+
+class InstrumentedPipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        commands = len(self.command_stack)
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            _record_redis_call(commands, time.perf_counter() - started)
+
+class RedisInstrumentation:
+    """Mixin timing every command and pipeline a Redis client sends."""
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            _record_redis_call(1, time.perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+class InstrumentedRedis(RedisInstrumentation, redis.Redis):
+    pass
+
+class RedisConnection:
+    """Process-local Redis client over an explicitly sized blocking pool.
+
+    Nothing connects at import or app creation time. The pool is built on
+    first use and rebuilt if the process has forked since, so every
+    gunicorn worker owns its connections.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._pid = None
+        self._client = None
+        self._scripts = {}
+
+    def client(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._client = self._create_client()
+                    self._scripts = {}
+                    self._pid = os.getpid()
+        return self._client
+
+    def run_script(self, source, keys, args):
+        client = self.client()
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = client.register_script(source)
+        return script(keys=keys, args=args, client=client)
+
+    def _create_client(self):
+        url = self.config["REDIS_URL"]
+        if url.startswith("memory://"):
+            import fakeredis
+
+            class InstrumentedFakeRedis(RedisInstrumentation, fakeredis.FakeRedis):
+                pass
+
+            return InstrumentedFakeRedis(decode_responses=True)
+
+        pool = redis.BlockingConnectionPool.from_url(
+            url,
+            max_connections=int(self.config["REDIS_MAX_CONNECTIONS"]),
+            timeout=float(self.config["REDIS_POOL_TIMEOUT"]),
+            socket_timeout=float(self.config["REDIS_SOCKET_TIMEOUT"]),
+            socket_connect_timeout=float(self.config["REDIS_CONNECT_TIMEOUT"]),
+            health_check_interval=int(self.config["REDIS_HEALTH_CHECK_INTERVAL"]),
+            # Retry connection errors only. A reset after a command was sent
+            # is one too, so a retried command may run twice: the scripts
+            # recognise their own earlier run, and compaction watches its
+            # batch. Timeouts aren't retried.
+            retry=Retry(ExponentialBackoff(), int(self.config["REDIS_RETRIES"]),
+                        supported_errors=(redis.ConnectionError,)),
+            retry_on_error=[redis.ConnectionError],
+            decode_responses=True
+        )
+        return InstrumentedRedis(connection_pool=pool)
+
+class SnapshotCache:
+    """Per-process TTL cache of active-session snapshots.
+
+    Entries are keyed by the namespace's events channel. A load that races
+    with an invalidation is not stored, so a stale snapshot read from Redis
+    just before a start/stop can't outlive the event.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._generation = 0
+
+    def get(self, key, load):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        value = load()
+
+        with self._lock:
+            if self._generation == generation:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+                self._entries[key] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+class EventHub:
+    """Fans timer events out from one Redis subscription to local listeners.
+
+    Each process holds a single pattern subscription covering every events
+    channel, so open streams cost a queue each rather than a Redis
+    connection. Every event also invalidates the namespace in `cache`. The
+    listener thread is started on first use, i.e. after gunicorn has forked
+    the worker. If the subscription fails, every listener is sent None and
+    dropped.
+    """
+
+    PATTERNS = (GLOBAL_KEYS.events, "user:*:events")
+
+    def __init__(self, connection, cache, logger):
+        self._connection = connection
+        self._cache = cache
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._listeners = {}
+        self._thread = None
+
+    def listening(self):
+        """Start the subscription if needed; True once events are flowing."""
+        with self._lock:
+            self._ensure_running()
+            return self._thread.is_alive()
+
+    def subscribe(self, channel):
+        listener = queue.Queue()
+        with self._lock:
+            self._ensure_running()
+            self._listeners.setdefault(channel, set()).add(listener)
+        return listener
+
+    def unsubscribe(self, channel, listener):
+        with self._lock:
+            listeners = self._listeners.get(channel, set())
+            listeners.discard(listener)
+            if not listeners:
+                self._listeners.pop(channel, None)
+
+    def _ensure_running(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        pubsub = self._connection.client().pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(**{pattern: self._dispatch for pattern in self.PATTERNS})
+        self._thread = pubsub.run_in_thread(
+            sleep_time=1, daemon=True, exception_handler=self._handle_error
+        )
+
+    def _dispatch(self, message):
+        self._cache.invalidate(message["channel"])
+        with self._lock:
+            listeners = list(self._listeners.get(message["channel"], ()))
+        for listener in listeners:
+            listener.put(message["data"])
+
+    def _handle_error(self, exc, pubsub, thread):
+        self._logger.warning("Timer event subscription failed: %s", exc)
+        thread.stop()
+        pubsub.close()
+        self._cache.clear()
+        # Open streams would silently miss events from here on; end them so
+        # their clients reconnect and start over from a fresh snapshot
+        with self._lock:
+            if self._thread is thread:
+                self._thread = None
+            listeners = [listener for channel in self._listeners.values() for listener in channel]
+            self._listeners.clear()
+        for listener in listeners:
+            listener.put(None)
+
+TimerState = namedtuple("TimerState", ["connection", "cache", "events", "metrics"])
+
+def _state():
+    return current_app.extensions["timer"]
+
+def _redis():
+    return _state().connection.client()
+
+def _run_script(source, keys, args):
+    return _state().connection.run_script(source, keys, args)
+
+@timer.route('/timer/start', methods=['POST', 'OPTIONS'])
 def start_timer():
     """Start a new timer session with hourly pay rate."""
     if request.method == 'OPTIONS':
         return _build_cors_preflight_response()
-    
+    return _start(GLOBAL_KEYS)
+
+@timer.route('/timer/stop', methods=['POST', 'OPTIONS'])
+def stop_timer():
+    """Stop the active timer session."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    return _stop(GLOBAL_KEYS)
+
+@timer.route('/timer/active_status', methods=['GET', 'OPTIONS'])
+def get_active_timer_status():
+    """Check if there's an active timer session."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    return _active_status(GLOBAL_KEYS)
+
+@timer.route('/timer/history', methods=['GET', 'OPTIONS'])
+def get_history():
+    """Get a page of timer history, newest first.
+
+    Query parameters:
+        limit:  page size (default 50, max 500)
+        before:    only sessions that ended strictly before this ISO timestamp
+        before_id: with `before`, also include sessions that ended exactly at
+                   `before` and sort after this id (ties are ordered by id)
+        after:     only sessions that ended strictly after this ISO timestamp
+
+    To fetch the next page, pass the end_time and session_id of the last
+    item as `before` and `before_id`.
+    """
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    return _history(GLOBAL_KEYS)
+
+@timer.route('/timer/stream', methods=['GET', 'OPTIONS'])
+def stream_timer():
+    """Stream timer state as Server-Sent Events.
+
+    Sends a snapshot of the active session first, then one event per start
+    or stop. Clients compute elapsed time locally from start_time instead
+    of polling /timer/active_status. Run under an async worker
+    (gunicorn -k gevent) so idle streams don't each hold a thread.
+    """
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    return _stream(GLOBAL_KEYS)
+
+@timer.route('/timer/report', methods=['GET', 'OPTIONS'])
+def get_report():
+    """Get hours and earnings totals per day, week or month.
+
+    Query parameters:
+        granularity: day, week (ISO weeks starting Monday) or month
+        from, to:    inclusive YYYY-MM-DD range of session end dates
+                     (default: the last 30 days)
+
+    Served from per-day rollups, so the cost depends on the range rather
+    than the number of sessions.
+    """
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    return _report(GLOBAL_KEYS)
+
+@timer.route('/timer/export', methods=['GET', 'OPTIONS'])
+def export_history():
+    """Stream all completed sessions, oldest first, as NDJSON or CSV (?format=)."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    return _export(GLOBAL_KEYS)
+
+@timer.route('/timer/import', methods=['POST', 'OPTIONS'])
+def import_history():
+    """Import completed sessions from an NDJSON body, one session per line.
+
+    Each line needs the fields produced by /timer/export. Sessions whose id
+    is already stored or archived are skipped, so re-running an import is
+    safe.
+    """
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    return _import(GLOBAL_KEYS)
+
+@timer.route('/timer/cache_stats', methods=['GET', 'OPTIONS'])
+def get_cache_stats():
+    """Hit/miss counters for this worker's active-session cache."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    return _corsify_actual_response(jsonify(_state().cache.stats()))
+
+@timer.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, Redis and cache metrics for this worker in Prometheus text format."""
+    cache = _state().cache.stats()
+    body = _state().metrics.render(extra_counters=[
+        ("timer_active_cache_hits_total", "Active-session cache hits.", cache["hits"]),
+        ("timer_active_cache_misses_total", "Active-session cache misses.", cache["misses"]),
+    ])
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+@timer.route('/users/<user_id>/timer/start', methods=['POST', 'OPTIONS'])
+def start_user_timer(user_id):
+    """Start a new timer session for one user."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    if not USER_ID_PATTERN.match(user_id):
+        return jsonify({"error": "Invalid user id"}), 400
+    return _start(_user_keys(user_id))
+
+@timer.route('/users/<user_id>/timer/stop', methods=['POST', 'OPTIONS'])
+def stop_user_timer(user_id):
+    """Stop a user's active timer session."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    if not USER_ID_PATTERN.match(user_id):
+        return jsonify({"error": "Invalid user id"}), 400
+    return _stop(_user_keys(user_id))
+
+@timer.route('/users/<user_id>/timer/active_status', methods=['GET', 'OPTIONS'])
+def get_user_active_timer_status(user_id):
+    """Check if a user has an active timer session."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    if not USER_ID_PATTERN.match(user_id):
+        return jsonify({"error": "Invalid user id"}), 400
+    return _active_status(_user_keys(user_id))
+
+@timer.route('/users/<user_id>/timer/history', methods=['GET', 'OPTIONS'])
+def get_user_history(user_id):
+    """Get a page of a user's timer history; same parameters as /timer/history."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    if not USER_ID_PATTERN.match(user_id):
+        return jsonify({"error": "Invalid user id"}), 400
+    return _history(_user_keys(user_id))
+
+@timer.route('/users/<user_id>/timer/report', methods=['GET', 'OPTIONS'])
+def get_user_report(user_id):
+    """Get a user's earnings report; same parameters as /timer/report."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    if not USER_ID_PATTERN.match(user_id):
+        return jsonify({"error": "Invalid user id"}), 400
+    return _report(_user_keys(user_id))
+
+@timer.route('/users/<user_id>/timer/export', methods=['GET', 'OPTIONS'])
+def export_user_history(user_id):
+    """Stream a user's completed sessions; same parameters as /timer/export."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    if not USER_ID_PATTERN.match(user_id):
+        return jsonify({"error": "Invalid user id"}), 400
+    return _export(_user_keys(user_id))
+
+@timer.route('/users/<user_id>/timer/import', methods=['POST', 'OPTIONS'])
+def import_user_history(user_id):
+    """Import completed sessions for a user; same format as /timer/import."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    if not USER_ID_PATTERN.match(user_id):
+        return jsonify({"error": "Invalid user id"}), 400
+    return _import(_user_keys(user_id))
+
+@timer.route('/users/<user_id>/timer/stream', methods=['GET', 'OPTIONS'])
+def stream_user_timer(user_id):
+    """Stream a user's timer state as Server-Sent Events."""
+    if request.method == 'OPTIONS':
+        return _build_cors_preflight_response()
+    if not USER_ID_PATTERN.match(user_id):
+        return jsonify({"error": "Invalid user id"}), 400
+    return _stream(_user_keys(user_id))
+
+def _start(keys):
     data = request.get_json()
     if not data or 'hourly_pay' not in data:
         return jsonify({"error": "Missing hourly_pay"}), 400
     
     try:
         hourly_pay = float(data['hourly_pay'])
-    except ValueError:
+    except (TypeError, ValueError):
         return jsonify({"error": "hourly_pay must be a number"}), 400
+    if not math.isfinite(hourly_pay):
+        return jsonify({"error": "hourly_pay must be a finite number"}), 400
 
-    # Check for an existing active session
-    active_sessions = redis_client.smembers("active_sessions")
-    if active_sessions:
-        session_id = list(active_sessions)[0]
-        session_data = redis_client.hgetall(f"session:{session_id}")
+    status, session_id, stored_pay, start_time = _run_script(
+        START_SESSION_SCRIPT,
+        keys=[keys.active, keys.counter],
+        args=[keys.session_prefix, hourly_pay, datetime.utcnow().isoformat(), keys.events]
+    )
+    _state().cache.invalidate(keys.events)
 
+    if status == "already_running":
         return _corsify_actual_response(jsonify({
             "status": "already_running",
             "session_id": session_id,
-            "hourly_pay": float(session_data["hourly_pay"]),
-            "start_time": session_data["start_time"]
+            "hourly_pay": float(stored_pay),
+            "start_time": start_time
         }))
 
-    # Create new session
-    session_id = redis_client.incr("session_counter")
-    session_data = {
-        "start_time": datetime.utcnow().isoformat(),
-        "hourly_pay": hourly_pay,
-        "active": "true",
-        "end_time": "",
-        "total_pay": "0"
-    }
-
-    redis_client.hset(f"session:{session_id}", mapping=session_data)
-    redis_client.sadd("active_sessions", session_id)
-    
     return _corsify_actual_response(jsonify({
         "status": "started",
-        "session_id": session_id,
+        "session_id": int(session_id),
         "hourly_pay": hourly_pay
     }))
 
-@app.route('/timer/stop', methods=['POST', 'OPTIONS'])
-def stop_timer():
-    """Stop the active timer session."""
-    if request.method == 'OPTIONS':
-        return _build_cors_preflight_response()
+def _stop(keys):
+    end_time = datetime.utcnow()
+    result = _run_script(
+        STOP_SESSION_SCRIPT,
+        keys=[keys.active, keys.history, keys.rollups],
+        args=[
+            keys.session_prefix, end_time.isoformat(), _to_epoch(end_time), keys.events,
+            end_time.date().isoformat()
+        ]
+    )
+    _state().cache.invalidate(keys.events)
 
-    active_sessions = redis_client.smembers("active_sessions")
-    if not active_sessions:
+    if result[0] == "no_active":
         return jsonify({"error": "No active timer session"}), 400
-
-    session_id = list(active_sessions)[0]
-    session_key = f"session:{session_id}"
-    session_data = redis_client.hgetall(session_key)
-
-    if not session_data or session_data.get("active") != "true":
+    if result[0] == "invalid":
         return jsonify({"error": "Invalid or already stopped session"}), 400
 
-    # Calculate total pay
-    start_time = datetime.fromisoformat(session_data["start_time"])
-    end_time = datetime.utcnow()
-    elapsed_hours = (end_time - start_time).total_seconds() / 3600
-    total_pay = round(float(session_data["hourly_pay"]) * elapsed_hours, 2)
-
-    # Update session
-    redis_client.hset(session_key, mapping={
-        "active": "false",
-        "end_time": end_time.isoformat(),
-        "total_pay": str(total_pay)
-    })
-    redis_client.srem("active_sessions", session_id)
-
+    _, session_id, start_time, elapsed_hours, total_pay = result
     return _corsify_actual_response(jsonify({
         "status": "stopped",
         "session_id": session_id,
-        "start_time": session_data["start_time"],
+        "start_time": start_time,
         "end_time": end_time.isoformat(),
-        "total_pay": total_pay,
-        "hours_worked": round(elapsed_hours, 4)
+        "total_pay": float(total_pay),
+        "hours_worked": round(float(elapsed_hours), 4)
     }))
 
-@app.route('/timer/active_status', methods=['GET', 'OPTIONS'])
-def get_active_timer_status():
-    """Check if there's an active timer session."""
-    if request.method == 'OPTIONS':
-        return _build_cors_preflight_response()
+def _active_status(keys):
+    snapshot = _cached_active_snapshot(keys)
+    if not snapshot["active"]:
+        return _corsify_actual_response(jsonify(snapshot))
     
-    active_sessions = redis_client.smembers("active_sessions")
+    start_time = datetime.fromisoformat(snapshot["start_time"])
+    elapsed_seconds = (datetime.utcnow() - start_time).total_seconds()
+    
+    return _corsify_actual_response(jsonify({
+        **snapshot,
+        "elapsed_seconds": elapsed_seconds,
+        "current_earnings": elapsed_seconds * snapshot["hourly_pay"] / 3600
+    }))
+
+def _cached_active_snapshot(keys):
+    # Without a live subscription invalidations can't reach us, so read through
+    if not _state().events.listening():
+        return _active_snapshot(keys)
+    return _state().cache.get(keys.events, lambda: _active_snapshot(keys))
+
+def _active_snapshot(keys):
+    """The active session without any time-dependent fields."""
+    active_sessions = _redis().smembers(keys.active)
     if not active_sessions:
-        return _corsify_actual_response(jsonify({"active": False}))
+        return {"active": False}
     
     session_id = list(active_sessions)[0]
-    session_key = f"session:{session_id}"
-    session_data = redis_client.hgetall(session_key)
+    session_data = _redis().hgetall(f"{keys.session_prefix}{session_id}")
     
     if session_data.get("active", "false") != "true":
-        return _corsify_actual_response(jsonify({"active": False}))
-    
-    start_time = datetime.fromisoformat(session_data["start_time"])
-    elapsed_seconds = (datetime.utcnow() - start_time).total_seconds()
+        return {"active": False}
     
-    return _corsify_actual_response(jsonify({
+    return {
         "active": True,
         "session_id": session_id,
         "hourly_pay": float(session_data["hourly_pay"]),
-        "start_time": session_data["start_time"],
-        "elapsed_seconds": elapsed_seconds,
-        "current_earnings": elapsed_seconds * float(session_data["hourly_pay"]) / 3600
+        "start_time": session_data["start_time"]
+    }
+
+def _report(keys):
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in REPORT_GRANULARITIES:
+        return jsonify({"error": "granularity must be day, week or month"}), 400
+
+    try:
+        end = date.fromisoformat(request.args['to']) if 'to' in request.args else datetime.utcnow().date()
+        start = (date.fromisoformat(request.args['from']) if 'from' in request.args
+                 else end - timedelta(days=REPORT_DEFAULT_DAYS - 1))
+    except ValueError:
+        return jsonify({"error": "from and to must be YYYY-MM-DD dates"}), 400
+    if start > end:
+        return jsonify({"error": "from must not be after to"}), 400
+    if (end - start).days >= REPORT_MAX_DAYS:
+        return jsonify({"error": f"Range is limited to {REPORT_MAX_DAYS} days"}), 400
+
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    fields = [f"{day.isoformat()}:{field}" for day in days for field in ROLLUP_FIELDS]
+    values = _redis().hmget(keys.rollups, fields)
+
+    buckets = {}
+    for index, day in enumerate(days):
+        hours, pay, sessions = values[index * 3:index * 3 + 3]
+        bucket = buckets.setdefault(_report_period(day, granularity), {"hours": 0.0, "pay": 0.0, "sessions": 0})
+        bucket["hours"] += float(hours or 0)
+        bucket["pay"] += float(pay or 0)
+        bucket["sessions"] += int(sessions or 0)
+
+    report = [{
+        "period": period,
+        "hours": round(bucket["hours"], 4),
+        "total_pay": round(bucket["pay"], 2),
+        "sessions": bucket["sessions"]
+    } for period, bucket in buckets.items()]
+
+    return _corsify_actual_response(jsonify({
+        "granularity": granularity,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "total_hours": round(sum(bucket["hours"] for bucket in buckets.values()), 4),
+        "total_pay": round(sum(bucket["pay"] for bucket in buckets.values()), 2),
+        "buckets": report
     }))
 
-@app.route('/timer/history', methods=['GET', 'OPTIONS'])
-def get_history():
-    """Get timer history."""
-    if request.method == 'OPTIONS':
-        return _build_cors_preflight_response()
-    
-    session_keys = redis_client.keys("session:*")
+def _export(keys):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    def generate():
+        if export_format == "csv":
+            yield ",".join(EXPORT_FIELDS) + "\r\n"
+        for sessions in _iter_history_batches(keys):
+            if export_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+                writer.writerows(sessions)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(session) + "\n" for session in sessions)
+
+    mimetype = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename=history.{export_format}"
+    return _corsify_actual_response(response)
+
+def _iter_history_batches(keys):
+    """Yield completed sessions, archived months first, in batches of up to TRANSFER_BATCH_SIZE."""
+    for month in _redis().zrange(keys.archive_months, 0, -1):
+        sessions = sorted(_read_archive_month(keys, month), key=lambda entry: entry[0])
+        for start in range(0, len(sessions), TRANSFER_BATCH_SIZE):
+            yield [session for _, session in sessions[start:start + TRANSFER_BATCH_SIZE]]
+
+    # Page on the last (score, id) seen rather than an offset, so entries
+    # removed from the front by compact-history can't shift the window
+    cursor = (None, None)
+    while True:
+        entries = _index_range(keys.history, TRANSFER_BATCH_SIZE, start=cursor[0], start_id=cursor[1])
+        if not entries:
+            return
+        cursor = (entries[-1][1], entries[-1][0])
+        session_ids = [session_id for session_id, _ in entries]
+
+        pipe = _redis().pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hgetall(f"{keys.session_prefix}{session_id}")
+
+        yield [{
+            "session_id": session_id,
+            "start_time": session_data["start_time"],
+            "end_time": session_data["end_time"],
+            "hourly_pay": float(session_data["hourly_pay"]),
+            "total_pay": float(session_data["total_pay"])
+        } for session_id, session_data in zip(session_ids, pipe.execute())
+            if session_data.get("active") == "false"]
+
+def _import(keys):
+    imported = skipped = 0
+    batch = []
+    for line_number, line in enumerate(request.stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            batch.append(_parse_import_line(line))
+        except (ValueError, KeyError, TypeError, OverflowError):
+            return jsonify({
+                "error": f"Invalid session on line {line_number}",
+                "imported": imported,
+                "skipped": skipped
+            }), 400
+        if len(batch) >= TRANSFER_BATCH_SIZE:
+            written = _write_import_batch(keys, batch)
+            imported += written
+            skipped += len(batch) - written
+            batch = []
+    if batch:
+        written = _write_import_batch(keys, batch)
+        imported += written
+        skipped += len(batch) - written
+
+    return _corsify_actual_response(jsonify({"imported": imported, "skipped": skipped}))
+
+def _parse_import_line(line):
+    """Parse and validate one NDJSON session; raises ValueError if it can't be stored."""
+    record = json.loads(line)
+    if isinstance(record["session_id"], float) and not record["session_id"].is_integer():
+        raise ValueError("session_id must be an integer")
+    session = {
+        "session_id": int(record["session_id"]),
+        "start_time": _naive_utc(datetime.fromisoformat(record["start_time"])),
+        "end_time": _naive_utc(datetime.fromisoformat(record["end_time"])),
+        "hourly_pay": float(record["hourly_pay"]),
+        "total_pay": float(record["total_pay"])
+    }
+    if not 1 <= session["session_id"] <= MAX_SESSION_ID:
+        raise ValueError("session_id out of range")
+    if not (math.isfinite(session["hourly_pay"]) and math.isfinite(session["total_pay"])):
+        raise ValueError("pay must be a finite number")
+    if session["end_time"] < session["start_time"]:
+        raise ValueError("end_time is before start_time")
+    return session
+
+def _naive_utc(dt):
+    """Session timestamps are stored as naive UTC; convert offset-aware input."""
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _write_import_batch(keys, batch):
+    """Write the sessions that aren't stored or archived yet; returns how many were written."""
+    sessions = [{
+        "session_id": str(session["session_id"]),
+        "start_time": session["start_time"].isoformat(),
+        "end_time": session["end_time"].isoformat(),
+        "hourly_pay": repr(session["hourly_pay"]),
+        "total_pay": repr(session["total_pay"]),
+        "end_epoch": repr(_to_epoch(session["end_time"])),
+        "day": session["end_time"].date().isoformat(),
+        "month": session["end_time"].strftime("%Y-%m"),
+        "hours": repr((session["end_time"] - session["start_time"]).total_seconds() / 3600)
+    } for session in batch]
+    return _run_script(
+        IMPORT_SESSIONS_SCRIPT,
+        keys=[keys.counter, keys.history, keys.rollups],
+        args=[keys.session_prefix, json.dumps(sessions), keys.archive_prefix, ARCHIVE_RECORD.size]
+    )
+
+def _report_period(day, granularity):
+    if granularity == "week":
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if granularity == "month":
+        return day.strftime("%Y-%m")
+    return day.isoformat()
+
+def _stream(keys):
+    def generate():
+        # Subscribe before reading the snapshot so no transition falls in
+        # between. Both wait for the first read of the body, so a response
+        # that is never iterated (HEAD) leaves no listener behind.
+        listener = _state().events.subscribe(keys.events)
+        try:
+            snapshot = _cached_active_snapshot(keys)
+            yield _sse_message(json.dumps({
+                "event": "snapshot",
+                "server_time": datetime.utcnow().isoformat(),
+                **snapshot
+            }))
+            while True:
+                try:
+                    data = listener.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if data is None:
+                    return
+                yield _sse_message(data)
+        finally:
+            _state().events.unsubscribe(keys.events, listener)
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return _corsify_actual_response(response)
+
+def _sse_message(data):
+    return f"data: {data}\n\n"
+
+def _history(keys):
+    try:
+        limit = int(request.args.get('limit', HISTORY_DEFAULT_LIMIT))
+        before = _parse_bound(request.args.get('before'))
+        after = _parse_bound(request.args.get('after'))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer and before/after ISO timestamps"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+    limit = min(limit, HISTORY_MAX_LIMIT)
+    before_id = request.args.get('before_id') if before is not None else None
+
+    hot = _index_range(keys.history, limit, start=before, start_id=before_id, end=after, reverse=True)
+
+    # Archived months only matter if they can hold sessions that sort ahead of
+    # what the hot tier returned; with a full hot page that is rarely the case
+    oldest = hot[-1][1] if len(hot) >= limit else after
+    archived_months = _redis().zrevrangebyscore(
+        keys.archive_months,
+        before if before is not None else "+inf",
+        f"({oldest - ARCHIVE_MONTH_SPAN_SECONDS}" if oldest is not None else "-inf"
+    )
+
+    pipe = _redis().pipeline(transaction=False)
+    for session_id, _ in hot:
+        pipe.hgetall(f"{keys.session_prefix}{session_id}")
+
     history = []
-    
-    for key in session_keys:
-        session_data = redis_client.hgetall(key)
-        if session_data.get("active") == "false":
-            history.append({
-                "session_id": key.split(":")[1],
-                "start_time": session_data["start_time"],
-                "end_time": session_data["end_time"],
-                "hourly_pay": float(session_data["hourly_pay"]),
-                "total_pay": float(session_data["total_pay"])
-            })
-    
-    history.sort(key=lambda x: x["end_time"], reverse=True)
-    return _corsify_actual_response(jsonify(history))
+    for (session_id, end_epoch), session_data in zip(hot, pipe.execute()):
+        if session_data.get("active") != "false":
+            continue
+        history.append(((end_epoch, session_id), {
+            "session_id": session_id,
+            "start_time": session_data["start_time"],
+            "end_time": session_data["end_time"],
+            "hourly_pay": float(session_data["hourly_pay"]),
+            "total_pay": float(session_data["total_pay"])
+        }))
+
+    if archived_months:
+        history.extend(_archived_history(keys, archived_months, before, before_id, after, limit))
+        history.sort(key=lambda entry: entry[0], reverse=True)
+
+    return _corsify_actual_response(jsonify([session for _, session in history[:limit]]))
+
+def _index_range(key, limit, start=None, start_id=None, end=None, reverse=False):
+    """Up to `limit` (session_id, score) pairs from a score index, moving away from `start`.
+
+    Both bounds are exclusive. With `start_id`, entries scored exactly
+    `start` are kept when they come after `start_id` in Redis' order for
+    equal scores (by id), so paging on the last (score, id) seen never
+    skips or repeats ties.
+    """
+    if reverse:
+        fetch_range, open_start, open_end = _redis().zrevrangebyscore, "+inf", "-inf"
+    else:
+        fetch_range, open_start, open_end = _redis().zrangebyscore, "-inf", "+inf"
+    if start is None:
+        start_bound = open_start
+    else:
+        start_bound = start if start_id is not None else f"({start}"
+    end_bound = open_end if end is None else f"({end}"
+
+    fetch = limit
+    while True:
+        entries = fetch_range(key, start_bound, end_bound, start=0, num=fetch, withscores=True)
+        exhausted = len(entries) < fetch
+        if start_id is not None:
+            entries = [
+                (member, score) for member, score in entries
+                if score != start or (member < start_id if reverse else member > start_id)
+            ]
+        # Ties at `start` that were filtered out may have filled the window
+        if exhausted or len(entries) >= limit:
+            return entries[:limit]
+        fetch *= 2
+
+def _archived_history(keys, months, before, before_id, after, limit):
+    """Up to `limit` archived ((end epoch, id), session) pairs past the cursor, newest first.
+
+    `months` must be ordered newest first.
+    """
+    history = []
+    for month in months:
+        sessions = [
+            ((end_epoch, session["session_id"]), session)
+            for end_epoch, session in _read_archive_month(keys, month)
+            if _before_cursor(end_epoch, session["session_id"], before, before_id)
+            and (after is None or end_epoch > after)
+        ]
+        sessions.sort(key=lambda entry: entry[0], reverse=True)
+        history.extend(sessions)
+        if len(history) >= limit:
+            break
+    return history[:limit]
+
+def _before_cursor(end_epoch, session_id, before, before_id):
+    if before is None or end_epoch < before:
+        return True
+    return before_id is not None and end_epoch == before and session_id < before_id
+
+def _read_archive_month(keys, month):
+    blob = _redis().execute_command("GET", f"{keys.archive_prefix}{month}", **{NEVER_DECODE: True})
+    return _unpack_sessions(blob or b"")
+
+def _pack_session(session_id, session_data):
+    return ARCHIVE_RECORD.pack(
+        int(session_id),
+        _epoch_micros(datetime.fromisoformat(session_data["start_time"])),
+        _epoch_micros(datetime.fromisoformat(session_data["end_time"])),
+        float(session_data["hourly_pay"]),
+        float(session_data["total_pay"])
+    )
+
+def _unpack_sessions(blob):
+    """Yield (end epoch seconds, session dict) for each packed archive record."""
+    for session_id, start_us, end_us, hourly_pay, total_pay in ARCHIVE_RECORD.iter_unpack(blob):
+        end_time = EPOCH + timedelta(microseconds=end_us)
+        yield _to_epoch(end_time), {
+            "session_id": str(session_id),
+            "start_time": (EPOCH + timedelta(microseconds=start_us)).isoformat(),
+            "end_time": end_time.isoformat(),
+            "hourly_pay": hourly_pay,
+            "total_pay": total_pay
+        }
+
+def _epoch_micros(dt):
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+@timer.cli.command('compact-history')
+@click.option('--older-than-days', type=int, default=None,
+              help="Archive sessions that ended this many days ago. [default: ARCHIVE_AFTER_DAYS]")
+@click.option('--user', 'user_id', default=None, help="Compact one user's history instead of the global one.")
+@click.option('--batch-size', default=1000, show_default=True)
+def compact_history(older_than_days, user_id, batch_size):
+    """Move old completed sessions from their hashes into packed monthly archives.
+
+    Meant to run periodically (e.g. from cron). Reads through /timer/history,
+    /timer/export and rebuild-rollups are unaffected; only one compaction
+    should run per namespace at a time.
+    """
+    if older_than_days is None:
+        older_than_days = int(current_app.config["ARCHIVE_AFTER_DAYS"])
+    keys = _user_keys(user_id) if user_id else GLOBAL_KEYS
+    cutoff = _to_epoch(datetime.utcnow() - timedelta(days=older_than_days))
+    archived = compact_sessions(keys, cutoff, batch_size)
+    click.echo(f"Archived {archived} sessions that ended more than {older_than_days} days ago")
+
+def compact_sessions(keys, cutoff, batch_size=1000):
+    """Archive completed sessions in `keys` that ended before epoch `cutoff`."""
+    archived = 0
+    # Entries that aren't archived stay in the index, so page past them on
+    # the last (score, id) seen
+    cursor = (None, None)
+    while True:
+        entries = _index_range(keys.history, batch_size, start=cursor[0], start_id=cursor[1], end=cutoff)
+        if not entries:
+            return archived
+        try:
+            archived += _archive_batch(keys, [session_id for session_id, _ in entries])
+        except redis.WatchError:
+            # A session in the batch changed or the connection dropped during
+            # EXEC; read the batch again, skipping whatever was archived
+            continue
+        cursor = (entries[-1][1], entries[-1][0])
+
+def _archive_batch(keys, session_ids):
+    """Archive the completed sessions among `session_ids`; returns how many were archived.
+
+    Their hashes are watched, so a retry after a reset can't append the
+    records a second time; redis-py raises WatchError instead.
+    """
+    session_keys = [f"{keys.session_prefix}{session_id}" for session_id in session_ids]
+    with _redis().pipeline(transaction=True) as pipe:
+        pipe.watch(*session_keys)
+        reads = _redis().pipeline(transaction=False)
+        for session_key in session_keys:
+            reads.hgetall(session_key)
+
+        records = {}
+        months = {}
+        archived_ids = []
+        for session_id, session_data in zip(session_ids, reads.execute()):
+            if session_data.get("active") != "false":
+                continue
+            archived_ids.append(session_id)
+            end_time = datetime.fromisoformat(session_data["end_time"])
+            month = end_time.strftime("%Y-%m")
+            records.setdefault(month, []).append(_pack_session(session_id, session_data))
+            months[month] = _to_epoch(datetime(end_time.year, end_time.month, 1))
+        if not archived_ids:
+            return 0
+
+        pipe.multi()
+        for month, packed in records.items():
+            pipe.append(f"{keys.archive_prefix}{month}", b"".join(packed))
+        pipe.zadd(keys.archive_months, months)
+        pipe.delete(*(f"{keys.session_prefix}{session_id}" for session_id in archived_ids))
+        pipe.zrem(keys.history, *archived_ids)
+        pipe.execute()
+    return len(archived_ids)
+
+@timer.cli.command('backfill-history')
+@click.option('--batch-size', default=1000, show_default=True)
+def backfill_history(batch_size):
+    """Index existing completed session:* hashes into the history index."""
+    indexed = 0
+    keys = []
+    for key in _redis().scan_iter("session:*", count=batch_size):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            indexed += _index_sessions(keys)
+            keys = []
+    if keys:
+        indexed += _index_sessions(keys)
+    click.echo(f"Indexed {indexed} completed sessions into {HISTORY_INDEX}")
+
+def _index_sessions(keys):
+    pipe = _redis().pipeline(transaction=False)
+    for key in keys:
+        pipe.hmget(key, "active", "end_time")
+
+    scores = {}
+    for key, (active, end_time) in zip(keys, pipe.execute()):
+        if active == "false" and end_time:
+            scores[key.split(":")[1]] = _to_epoch(datetime.fromisoformat(end_time))
+    if scores:
+        _redis().zadd(HISTORY_INDEX, scores)
+    return len(scores)
+
+@timer.cli.command('rebuild-rollups')
+@click.option('--user', 'user_id', default=None, help="Rebuild one user's rollups instead of the global ones.")
+@click.option('--batch-size', default=1000, show_default=True)
+def rebuild_rollups(user_id, batch_size):
+    """Recompute the per-day report rollups from the raw and archived sessions."""
+    keys = _user_keys(user_id) if user_id else GLOBAL_KEYS
+    rollups = {}
+    batch = []
+    for key in _redis().scan_iter(f"{keys.session_prefix}*", count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            _accumulate_rollups(batch, rollups)
+            batch = []
+    if batch:
+        _accumulate_rollups(batch, rollups)
+    for month in _redis().zrange(keys.archive_months, 0, -1):
+        for _, session in _read_archive_month(keys, month):
+            _add_to_rollups(rollups, session["start_time"], session["end_time"], session["total_pay"])
+
+    pipe = _redis().pipeline(transaction=True)
+    pipe.delete(keys.rollups)
+    if rollups:
+        pipe.hset(keys.rollups, mapping=rollups)
+    pipe.execute()
+    click.echo(f"Rebuilt {len(rollups) // len(ROLLUP_FIELDS)} daily rollups in {keys.rollups}")
+
+def _accumulate_rollups(keys, rollups):
+    pipe = _redis().pipeline(transaction=False)
+    for key in keys:
+        pipe.hmget(key, "active", "start_time", "end_time", "total_pay")
+
+    for active, start_time, end_time, total_pay in pipe.execute():
+        if active == "false" and end_time:
+            _add_to_rollups(rollups, start_time, end_time, total_pay)
+
+def _add_to_rollups(rollups, start_time, end_time, total_pay):
+    end = datetime.fromisoformat(end_time)
+    hours = (end - datetime.fromisoformat(start_time)).total_seconds() / 3600
+    day = end.date().isoformat()
+    rollups[f"{day}:hours"] = rollups.get(f"{day}:hours", 0.0) + hours
+    rollups[f"{day}:pay"] = rollups.get(f"{day}:pay", 0.0) + float(total_pay)
+    rollups[f"{day}:sessions"] = rollups.get(f"{day}:sessions", 0) + 1
+
+def _to_epoch(dt):
+    """Session timestamps are naive UTC; convert to epoch seconds."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def _parse_bound(value):
+    if not value:
+        return None
+    return _to_epoch(datetime.fromisoformat(value))
+
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+def _record_request(response):
+    # Runs before a streamed body is generated, so streams are timed to their headers
+    if "request_started" not in g:
+        return response
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    labels = (("route", route), ("method", request.method))
+    metrics = _state().metrics
+    metrics.observe(
+        "timer_request_duration_seconds", "Request latency by route.",
+        LATENCY_BUCKETS, time.perf_counter() - g.request_started, labels
+    )
+    metrics.inc("timer_requests_total", "Requests by route and status.", labels + (("status", str(response.status_code)),))
+    if response.status_code >= 500:
+        metrics.inc("timer_request_errors_total", "Requests that failed with a 5xx status.", labels)
+    metrics.observe(
+        "timer_request_redis_commands", "Redis commands per request.",
+        REDIS_COMMAND_BUCKETS, g.get("redis_commands", 0), labels
+    )
+    metrics.observe(
+        "timer_request_redis_seconds", "Time spent on Redis per request.",
+        LATENCY_BUCKETS, g.get("redis_seconds", 0.0), labels
+    )
+    return response
 
 def _build_cors_preflight_response():
     response = jsonify({"status": "preflight"})
@@ -167,5 +1362,29 @@ def _corsify_actual_response(response):
     response.headers.add("Access-Control-Allow-Origin", "*")
     return response
 
+def create_app(config=None):
+    """Build the app; settings come from DEFAULT_CONFIG, the environment, then `config`."""
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.from_mapping(DEFAULT_CONFIG)
+    app.config.from_mapping({key: os.environ[key] for key in DEFAULT_CONFIG if key in os.environ})
+    if config:
+        app.config.from_mapping(config)
+
+    CORS(app, resources={
+        r"/timer/*": {"origins": "*"},
+        r"/users/*": {"origins": "*"}
+    })
+
+    connection = RedisConnection(app.config)
+    cache = SnapshotCache(ACTIVE_CACHE_TTL_SECONDS, ACTIVE_CACHE_MAX_ENTRIES)
+    app.extensions["timer"] = TimerState(connection, cache, EventHub(connection, cache, app.logger), Metrics())
+    app.before_request(_start_request_timer)
+    app.after_request(_record_request)
+    app.register_blueprint(timer)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
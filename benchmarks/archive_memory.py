@@ -0,0 +1,74 @@
+"""Report Redis memory per session before and after archival compaction.
+
+Writes synthetic completed sessions into a fresh user namespace as regular
+session hashes, measures used_memory, compacts them all into monthly
+archives and measures again, e.g.
+
+    python benchmarks/archive_memory.py --url redis://localhost:6379/0 --sessions 1000000
+
+Needs a real redis-server: used_memory comes from INFO, which the memory://
+backend doesn't report. Figures for 1M sessions are still to be collected.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from app import _to_epoch, _user_keys, compact_sessions, create_app  # noqa: E402
+
+
+def _used_memory(client):
+    return client.info("memory")["used_memory"]
+
+
+def _populate(client, keys, sessions, batch_size=10000):
+    start = datetime(2020, 1, 1)
+    pipe = client.pipeline(transaction=False)
+    for session_id in range(1, sessions + 1):
+        start_time = start + timedelta(minutes=session_id * 7, microseconds=session_id)
+        end_time = start_time + timedelta(minutes=30 + session_id % 240)
+        hours = (end_time - start_time).total_seconds() / 3600
+        pipe.hset(f"{keys.session_prefix}{session_id}", mapping={
+            "start_time": start_time.isoformat(),
+            "hourly_pay": 25.0,
+            "active": "false",
+            "end_time": end_time.isoformat(),
+            "total_pay": str(round(25.0 * hours, 2))
+        })
+        pipe.zadd(keys.history, {session_id: _to_epoch(end_time)})
+        if session_id % batch_size == 0:
+            pipe.execute()
+    pipe.execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+    parser.add_argument("--sessions", type=int, default=1000000)
+    args = parser.parse_args()
+    if args.url.startswith("memory://"):
+        parser.error("--url must point at a real Redis server; memory:// doesn't report used_memory")
+
+    app = create_app({"REDIS_URL": args.url})
+    keys = _user_keys(f"bench-archive-{int(time.time())}")
+    with app.app_context():
+        client = app.extensions["timer"].connection.client()
+        baseline = _used_memory(client)
+
+        started = time.perf_counter()
+        _populate(client, keys, args.sessions)
+        hot = _used_memory(client) - baseline
+        print(f"hot:      {hot / 1e6:8.1f} MB, {hot / args.sessions:6.1f} bytes/session "
+              f"(populated in {time.perf_counter() - started:.1f}s)")
+
+        started = time.perf_counter()
+        archived = compact_sessions(keys, float("inf"), batch_size=5000)
+        compacted = _used_memory(client) - baseline
+        print(f"archived: {compacted / 1e6:8.1f} MB, {compacted / archived:6.1f} bytes/session "
+              f"({archived} sessions compacted in {time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark streamed NDJSON import and NDJSON/CSV export of session history.
+
+Uploads synthetic completed sessions into a fresh user namespace, then
+streams them back out, against a running server, e.g.
+
+    gunicorn -w 4 -b 127.0.0.1:5000 app:app
+    python benchmarks/export_import.py --sessions 1000000
+"""
+import argparse
+import http.client
+import json
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+
+
+def _synthetic_sessions(count):
+    start = datetime(2020, 1, 1)
+    for session_id in range(1, count + 1):
+        start_time = start + timedelta(minutes=session_id * 7)
+        end_time = start_time + timedelta(minutes=30 + session_id % 240)
+        hours = (end_time - start_time).total_seconds() / 3600
+        yield (json.dumps({
+            "session_id": session_id,
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(),
+            "hourly_pay": 25.0,
+            "total_pay": round(25.0 * hours, 2)
+        }) + "\n").encode()
+
+
+def _chunks(lines, lines_per_chunk=1000):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= lines_per_chunk:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+
+def _connection(url):
+    parsed = urllib.parse.urlparse(url)
+    return http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=3600)
+
+
+def run_import(url, path, sessions):
+    conn = _connection(url)
+    started = time.perf_counter()
+    conn.request(
+        "POST", path, body=_chunks(_synthetic_sessions(sessions)),
+        headers={"Content-Type": "application/x-ndjson"}, encode_chunked=True
+    )
+    response = conn.getresponse()
+    result = json.loads(response.read())
+    elapsed = time.perf_counter() - started
+    conn.close()
+    print(f"import: {result} in {elapsed:.2f}s ({sessions / elapsed:.0f} sessions/s)")
+
+
+def run_export(url, path, export_format):
+    conn = _connection(url)
+    started = time.perf_counter()
+    conn.request("GET", f"{path}?format={export_format}")
+    response = conn.getresponse()
+    first_byte = time.perf_counter() - started
+    lines = size = 0
+    while True:
+        chunk = response.read(1 << 16)
+        if not chunk:
+            break
+        lines += chunk.count(b"\n")
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    print(
+        f"export {export_format}: {lines} lines, {size / 1e6:.1f} MB in {elapsed:.2f}s "
+        f"({lines / elapsed:.0f} lines/s, first byte after {first_byte * 1000:.1f}ms)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--sessions", type=int, default=1000000)
+    args = parser.parse_args()
+
+    prefix = f"/users/bench-transfer-{int(time.time())}/timer"
+    run_import(args.url, f"{prefix}/import", args.sessions)
+    run_export(args.url, f"{prefix}/export", "ndjson")
+    run_export(args.url, f"{prefix}/export", "csv")
+
+
+if __name__ == "__main__":
+    main()
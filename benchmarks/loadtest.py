@@ -0,0 +1,165 @@
+"""Reproducible load test: the app under gunicorn against a local Redis.
+
+The server runs with the repo's gunicorn.conf.py, i.e. gevent workers as in
+production.
+
+For each history size, seeds a user's history through the import endpoint,
+then runs concurrent clients that start a timer, poll its status, stop it
+and read a history page. Prints throughput and latency percentiles per
+operation, followed by the server-side Redis cost per route from /metrics.
+
+    python benchmarks/loadtest.py --redis-url redis://localhost:6379/15 \\
+        --history-sizes 0 1000 10000 100000
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+OPERATIONS = ("start", "status", "stop", "history")
+
+
+def _start_server(args):
+    env = {**os.environ, "REDIS_URL": args.redis_url}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "-w", str(args.workers), "-b", f"127.0.0.1:{args.port}", "app:app"],
+        cwd=ROOT, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", args.port, timeout=1)
+            conn.request("GET", "/metrics")
+            conn.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not start within 30s")
+
+
+def _seed_history(port, user_id, size):
+    start = datetime(2024, 1, 1)
+    lines = []
+    for session_id in range(1, size + 1):
+        start_time = start + timedelta(minutes=session_id * 7)
+        end_time = start_time + timedelta(minutes=45)
+        lines.append(json.dumps({
+            "session_id": session_id,
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(),
+            "hourly_pay": 25.0,
+            "total_pay": 18.75
+        }))
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    conn.request("POST", f"/users/{user_id}/timer/import", body="\n".join(lines).encode(),
+                 headers={"Content-Type": "application/x-ndjson"})
+    conn.getresponse().read()
+
+
+class Client:
+    def __init__(self, port):
+        self._conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+
+    def request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        started = time.perf_counter()
+        self._conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = self._conn.getresponse()
+        response.read()
+        return time.perf_counter() - started, response.status
+
+
+def _run_client(port, user_id, history_user, iterations, polls, results, lock):
+    client = Client(port)
+    samples = {operation: [] for operation in OPERATIONS}
+    errors = 0
+    for _ in range(iterations):
+        calls = [("start", "POST", f"/users/{user_id}/timer/start", {"hourly_pay": 25})]
+        calls += [("status", "GET", f"/users/{user_id}/timer/active_status", None)] * polls
+        calls += [("stop", "POST", f"/users/{user_id}/timer/stop", None)]
+        calls += [("history", "GET", f"/users/{history_user}/timer/history?limit=50", None)]
+        for operation, method, path, body in calls:
+            elapsed, status = client.request(method, path, body)
+            samples[operation].append(elapsed)
+            errors += status >= 400
+    with lock:
+        for operation, values in samples.items():
+            results[operation].extend(values)
+        results["errors"] += errors
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+
+def _redis_cost_per_route(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/metrics")
+    text = conn.getresponse().read().decode()
+    totals = {}
+    for metric, route, value in re.findall(r'(timer_request_redis_commands_(?:sum|count))\{route="([^"]+)"[^}]*\} (\S+)', text):
+        totals.setdefault(route, {})[metric.rsplit("_", 1)[1]] = float(value)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=50, help="start/poll/stop/history cycles per client")
+    parser.add_argument("--polls", type=int, default=5)
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[0, 1000, 10000, 100000])
+    args = parser.parse_args()
+
+    server = _start_server(args)
+    run_id = int(time.time())
+    try:
+        for size in args.history_sizes:
+            history_user = f"load-{run_id}-{size}-history"
+            _seed_history(args.port, history_user, size)
+
+            results = {operation: [] for operation in OPERATIONS}
+            results["errors"] = 0
+            lock = threading.Lock()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.clients) as pool:
+                futures = [
+                    pool.submit(_run_client, args.port, f"load-{run_id}-{size}-{index}", history_user,
+                                args.iterations, args.polls, results, lock)
+                    for index in range(args.clients)
+                ]
+                for future in futures:
+                    future.result()
+            elapsed = time.perf_counter() - started
+
+            total = sum(len(results[operation]) for operation in OPERATIONS)
+            print(f"\nhistory size {size}: {total / elapsed:.0f} req/s over {elapsed:.1f}s, {results['errors']} errors")
+            for operation in OPERATIONS:
+                values = results[operation]
+                print(f"  {operation:>8}: p50={_percentile(values, 50):7.2f}ms "
+                      f"p90={_percentile(values, 90):7.2f}ms p99={_percentile(values, 99):7.2f}ms")
+
+        print("\nRedis commands per request (one worker's view, from /metrics):")
+        for route, totals in sorted(_redis_cost_per_route(args.port).items()):
+            if totals.get("count"):
+                print(f"  {route}: {totals['sum'] / totals['count']:.2f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare Redis latency under concurrency with and without connection pooling.
+
+Runs the active_status read path (SMEMBERS + HGETALL) from many threads
+using a fresh connection per request, redis-py's default unbounded pool, and
+the app's sized BlockingConnectionPool, e.g.
+
+    python benchmarks/redis_pool.py --url redis://localhost:6379/0 --threads 64
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from app import DEFAULT_CONFIG, RedisConnection  # noqa: E402
+
+
+def _status_read(client):
+    client.smembers("bench:active")
+    client.hgetall("bench:session:1")
+
+
+def _unpooled(url):
+    def run():
+        client = redis.Redis.from_url(url, decode_responses=True)
+        try:
+            _status_read(client)
+        finally:
+            client.close()
+            client.connection_pool.disconnect()
+    return run
+
+
+def _shared(url):
+    client = redis.Redis.from_url(url, decode_responses=True)
+    return lambda: _status_read(client)
+
+
+def _blocking(url, max_connections):
+    connection = RedisConnection({**DEFAULT_CONFIG, "REDIS_URL": url, "REDIS_MAX_CONNECTIONS": max_connections})
+    return lambda: _status_read(connection.client())
+
+
+def _measure(name, operation, threads, requests):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(_):
+        started = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(requests)))
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:>9}: {requests / total:8.0f} req/s  p50={p50 * 1000:.2f}ms  p99={p99 * 1000:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.environ.get("REDIS_URL", DEFAULT_CONFIG["REDIS_URL"]))
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_CONFIG["REDIS_MAX_CONNECTIONS"])
+    args = parser.parse_args()
+
+    setup = redis.Redis.from_url(args.url, decode_responses=True)
+    setup.sadd("bench:active", "1")
+    setup.hset("bench:session:1", mapping={"start_time": "2026-01-01T00:00:00", "hourly_pay": "25.0", "active": "true"})
+
+    _measure("unpooled", _unpooled(args.url), args.threads, args.requests)
+    _measure("shared", _shared(args.url), args.threads, args.requests)
+    _measure("blocking", _blocking(args.url, args.max_connections), args.threads, args.requests)
+
+    setup.delete("bench:active", "bench:session:1")
+
+
+if __name__ == "__main__":
+    main()
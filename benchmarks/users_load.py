@@ -0,0 +1,80 @@
+"""Load benchmark for the per-user /users/<id>/timer/* endpoints.
+
+Simulates many users concurrently starting a timer, polling its status and
+stopping it against a running server, e.g.
+
+    gunicorn -w 4 -b 127.0.0.1:5000 app:app
+    python benchmarks/users_load.py --users 10000 --concurrency 500
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _request(base_url, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        base_url + path, data=data, method=method,
+        headers={"Content-Type": "application/json"}
+    )
+    started = time.perf_counter()
+    with urllib.request.urlopen(req) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def _run_user(base_url, user_id, polls, latencies, lock):
+    timings = {"start": [], "status": [], "stop": []}
+    timings["start"].append(_request(base_url, "POST", f"/users/{user_id}/timer/start", {"hourly_pay": 25}))
+    for _ in range(polls):
+        timings["status"].append(_request(base_url, "GET", f"/users/{user_id}/timer/active_status"))
+    timings["stop"].append(_request(base_url, "POST", f"/users/{user_id}/timer/stop"))
+    with lock:
+        for op, samples in timings.items():
+            latencies[op].extend(samples)
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--polls", type=int, default=5, help="status polls per user")
+    args = parser.parse_args()
+
+    latencies = {"start": [], "status": [], "stop": []}
+    lock = threading.Lock()
+    run_id = int(time.time())
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(_run_user, args.url, f"bench-{run_id}-{i}", args.polls, latencies, lock)
+            for i in range(args.users)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"{args.users} users, {total} requests in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+    for op, samples in latencies.items():
+        print(
+            f"{op:>6}: n={len(samples):<7} "
+            f"p50={_percentile(samples, 50) * 1000:.2f}ms "
+            f"p99={_percentile(samples, 99) * 1000:.2f}ms "
+            f"mean={statistics.mean(samples) * 1000:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""Gunicorn settings, loaded automatically when gunicorn starts in the repo root.
+
+gevent workers are required for /timer/stream: an open SSE stream is a
+greenlet rather than a whole sync worker, so one process can hold
+thousands of them.
+"""
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+worker_class = "gevent"
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "2000"))
@@ -0,0 +1,21 @@
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture
+def app():
+    app = create_app({"REDIS_URL": "memory://", "TESTING": True})
+    app.extensions["timer"].connection.client().flushall()
+    yield app
+    app.extensions["timer"].connection.client().flushall()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def redis_client(app):
+    return app.extensions["timer"].connection.client()
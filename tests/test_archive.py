@@ -0,0 +1,54 @@
+import json
+
+import app as timer_app
+
+
+def _ndjson(count):
+    return "\n".join(json.dumps({
+        "session_id": session_id,
+        "start_time": "2026-01-01T09:00:00",
+        "end_time": "2026-01-01T10:00:00",
+        "hourly_pay": 20.0,
+        "total_pay": 20.0
+    }) for session_id in range(1, count + 1))
+
+
+def test_reimport_after_compaction_skips_archived_sessions(app, client):
+    assert client.post("/timer/import", data=_ndjson(10)).get_json() == {"imported": 10, "skipped": 0}
+    with app.app_context():
+        assert timer_app.compact_sessions(timer_app.GLOBAL_KEYS, float("inf")) == 10
+
+    assert client.post("/timer/import", data=_ndjson(10)).get_json() == {"imported": 0, "skipped": 10}
+    history = client.get("/timer/history").get_json()
+    assert sorted(int(session["session_id"]) for session in history) == list(range(1, 11))
+    report = client.get("/timer/report?granularity=month&from=2026-01-01&to=2026-01-31").get_json()
+    assert report["buckets"][0]["sessions"] == 10
+    assert report["total_pay"] == 200.0
+
+
+def test_reimport_of_large_archived_ids_is_skipped(app, client, redis_client):
+    body = "\n".join(json.dumps({
+        "session_id": session_id,
+        "start_time": "2026-01-01T09:00:00",
+        "end_time": "2026-01-01T10:00:00",
+        "hourly_pay": 20.0,
+        "total_pay": 20.0
+    }) for session_id in (2 ** 32 - 1, timer_app.MAX_SESSION_ID))
+    assert client.post("/timer/import", data=body).get_json() == {"imported": 2, "skipped": 0}
+    with app.app_context():
+        assert timer_app.compact_sessions(timer_app.GLOBAL_KEYS, float("inf")) == 2
+
+    assert client.post("/timer/import", data=body).get_json() == {"imported": 0, "skipped": 2}
+    assert redis_client.strlen("session_archive:2026-01") == 2 * timer_app.ARCHIVE_RECORD.size
+    assert redis_client.get("session_counter") == str(timer_app.MAX_SESSION_ID)
+
+
+def test_compaction_leaves_sessions_it_did_not_archive(app, client, redis_client):
+    client.post("/timer/import", data=_ndjson(3))
+    redis_client.hset("session:2", "active", "true")
+    with app.app_context():
+        assert timer_app.compact_sessions(timer_app.GLOBAL_KEYS, float("inf"), batch_size=1) == 2
+
+    assert redis_client.hget("session:2", "active") == "true"
+    assert redis_client.zrange("session_history", 0, -1) == ["2"]
+    assert not redis_client.exists("session:1", "session:3")
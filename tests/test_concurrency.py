@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+PARALLEL_STARTS = 250
+
+
+def _start_in_parallel(app, path):
+    def start(_):
+        return app.test_client().post(path, json={"hourly_pay": 20}).get_json()["status"]
+
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        return list(pool.map(start, range(PARALLEL_STARTS)))
+
+
+def test_parallel_starts_create_exactly_one_session(app, redis_client):
+    statuses = _start_in_parallel(app, "/timer/start")
+
+    assert statuses.count("started") == 1
+    assert statuses.count("already_running") == PARALLEL_STARTS - 1
+    assert redis_client.scard("active_sessions") == 1
+    assert redis_client.get("session_counter") == "1"
+
+
+def test_parallel_user_starts_create_exactly_one_session(app, redis_client):
+    statuses = _start_in_parallel(app, "/users/alice/timer/start")
+
+    assert statuses.count("started") == 1
+    assert redis_client.scard("user:{alice}:active") == 1
+    assert redis_client.get("user:{alice}:counter") == "1"
+    assert redis_client.scard("active_sessions") == 0
@@ -0,0 +1,46 @@
+import json
+
+
+def _line(session_id, **fields):
+    return json.dumps({
+        "session_id": session_id,
+        "start_time": "2026-01-01T09:00:00",
+        "end_time": "2026-01-01T10:00:00",
+        "hourly_pay": 20.0,
+        "total_pay": 20.0,
+        **fields
+    })
+
+
+def test_import_skips_the_id_of_an_active_session(client, redis_client):
+    assert client.post("/timer/start", json={"hourly_pay": 20}).get_json()["session_id"] == 1
+
+    assert client.post("/timer/import", data=_line(1)).get_json() == {"imported": 0, "skipped": 1}
+    assert redis_client.hget("session:1", "active") == "true"
+    assert redis_client.zcard("session_history") == 0
+    assert client.post("/timer/stop").get_json()["status"] == "stopped"
+
+
+def test_start_after_import_gets_a_fresh_id(client, redis_client):
+    assert client.post("/timer/import", data=_line(7)).get_json() == {"imported": 1, "skipped": 0}
+
+    assert redis_client.get("session_counter") == "7"
+    assert client.post("/timer/start", json={"hourly_pay": 20}).get_json()["session_id"] == 8
+
+
+def test_repeated_ids_in_one_batch_are_written_once(client):
+    body = "\n".join([_line(1), _line(1), _line(2)])
+
+    assert client.post("/timer/import", data=body).get_json() == {"imported": 2, "skipped": 1}
+    report = client.get("/timer/report?from=2026-01-01&to=2026-01-01").get_json()
+    assert report["buckets"][0]["sessions"] == 2
+    assert report["total_pay"] == 40.0
+    assert len(client.get("/timer/history").get_json()) == 2
+
+
+def test_non_integral_session_id_is_rejected(client, redis_client):
+    response = client.post("/timer/import", data="\n".join([_line(1), _line(2.9)]))
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid session on line 2"
+    assert not redis_client.exists("session:2")
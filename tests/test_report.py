@@ -0,0 +1,84 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as timer_app
+
+
+class FrozenDatetime(datetime):
+    current = None
+
+    @classmethod
+    def utcnow(cls):
+        return cls.current
+
+
+def _seed_sessions(client, monkeypatch, count=150):
+    monkeypatch.setattr(timer_app, "datetime", FrozenDatetime)
+    rng = random.Random(7)
+    base = datetime(2026, 1, 1)
+    for _ in range(count):
+        start = base + timedelta(hours=rng.uniform(0, 24 * 90))
+        FrozenDatetime.current = FrozenDatetime.fromisoformat(start.isoformat())
+        client.post("/timer/start", json={"hourly_pay": rng.uniform(10, 60)})
+        FrozenDatetime.current += timedelta(hours=rng.uniform(0.1, 12))
+        client.post("/timer/stop")
+    monkeypatch.undo()
+
+
+def _period(day, granularity):
+    if granularity == "week":
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if granularity == "month":
+        return day.strftime("%Y-%m")
+    return day.isoformat()
+
+
+def _brute_force(redis_client, granularity):
+    buckets = {}
+    for key in redis_client.scan_iter("session:*"):
+        session = redis_client.hgetall(key)
+        start = datetime.fromisoformat(session["start_time"])
+        end = datetime.fromisoformat(session["end_time"])
+        bucket = buckets.setdefault(_period(end.date(), granularity), {"hours": 0.0, "pay": 0.0, "sessions": 0})
+        bucket["hours"] += (end - start).total_seconds() / 3600
+        bucket["pay"] += float(session["total_pay"])
+        bucket["sessions"] += 1
+    return buckets
+
+
+def _assert_report_matches(client, redis_client, granularity):
+    report = client.get(f"/timer/report?granularity={granularity}&from=2026-01-01&to=2026-04-30").get_json()
+    expected = _brute_force(redis_client, granularity)
+    assert expected
+
+    reported = {bucket["period"]: bucket for bucket in report["buckets"] if bucket["sessions"]}
+    assert reported.keys() == expected.keys()
+    for period, bucket in expected.items():
+        assert reported[period]["sessions"] == bucket["sessions"]
+        assert reported[period]["hours"] == pytest.approx(bucket["hours"], abs=1e-3)
+        assert reported[period]["total_pay"] == pytest.approx(bucket["pay"], abs=0.01)
+    assert report["total_pay"] == pytest.approx(sum(bucket["pay"] for bucket in expected.values()), abs=0.01)
+
+
+@pytest.mark.parametrize("granularity", ["day", "week", "month"])
+def test_report_matches_brute_force_sum(client, redis_client, monkeypatch, granularity):
+    _seed_sessions(client, monkeypatch)
+
+    _assert_report_matches(client, redis_client, granularity)
+
+
+def test_rebuild_rollups_reproduces_incremental_rollups(app, client, redis_client, monkeypatch):
+    _seed_sessions(client, monkeypatch)
+    incremental = redis_client.hgetall("session_rollups")
+
+    result = app.test_cli_runner().invoke(args=["rebuild-rollups"])
+
+    assert result.exit_code == 0
+    rebuilt = redis_client.hgetall("session_rollups")
+    assert rebuilt.keys() == incremental.keys()
+    for field, value in incremental.items():
+        assert float(rebuilt[field]) == pytest.approx(float(value), abs=1e-6)
+    for granularity in ("day", "week", "month"):
+        _assert_report_matches(client, redis_client, granularity)
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import app as timer_app
+
+KEYS = timer_app.GLOBAL_KEYS
+
+
+def _run_twice(app, source, keys, args):
+    with app.app_context():
+        return [timer_app._run_script(source, keys, args) for _ in range(2)]
+
+
+def test_rerun_start_script_reports_its_own_start(app, redis_client):
+    args = [KEYS.session_prefix, 20.0, "2026-01-01T09:00:00.123456", KEYS.events]
+    first, second = _run_twice(app, timer_app.START_SESSION_SCRIPT, [KEYS.active, KEYS.counter], args)
+
+    assert first[0] == "started"
+    assert second == first
+    assert redis_client.get("session_counter") == "1"
+
+
+def test_rerun_stop_script_reports_its_own_stop(app, client, redis_client):
+    client.post("/timer/start", json={"hourly_pay": 20})
+    end_time = datetime.utcnow()
+    args = [
+        KEYS.session_prefix, end_time.isoformat(), timer_app._to_epoch(end_time), KEYS.events,
+        end_time.date().isoformat()
+    ]
+    first, second = _run_twice(app, timer_app.STOP_SESSION_SCRIPT, [KEYS.active, KEYS.history, KEYS.rollups], args)
+
+    assert first[0] == "stopped"
+    assert second == first
+    assert redis_client.hget("session_rollups", f"{end_time.date().isoformat()}:sessions") == "1"
+    assert client.post("/timer/stop").get_json() == {"error": "No active timer session"}
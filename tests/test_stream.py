@@ -0,0 +1,40 @@
+import json
+
+
+def _listeners(app):
+    return app.extensions["timer"].events._listeners
+
+
+def test_head_requests_leave_no_listeners(app, client):
+    for _ in range(3):
+        assert client.head("/timer/stream").status_code == 200
+
+    assert _listeners(app) == {}
+
+
+def test_stream_sends_a_snapshot_and_unsubscribes_on_close(app, client):
+    response = client.get("/users/alice/timer/stream", buffered=False)
+    snapshot = json.loads(next(response.response).removeprefix(b"data: "))
+
+    assert snapshot["event"] == "snapshot"
+    assert snapshot["active"] is False
+    assert set(_listeners(app)) == {"user:{alice}:events"}
+    response.close()
+    assert _listeners(app) == {}
+
+
+class _PubSub:
+    def close(self):
+        pass
+
+
+def test_streams_end_when_the_subscription_fails(app, client):
+    response = client.get("/timer/stream", buffered=False)
+    next(response.response)
+    hub = app.extensions["timer"].events
+
+    hub._handle_error(ConnectionError("lost"), _PubSub(), hub._thread)
+
+    assert list(response.response) == []
+    assert _listeners(app) == {}
+    assert hub.listening()